@@ -1,8 +1,26 @@
+import argparse
 import os
 import re
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import chain
 from pathlib import Path
 from difflib import SequenceMatcher
 
+try:
+    from rapidfuzz import fuzz
+except ImportError:
+    # rapidfuzz is optional: without it every score goes through difflib
+    fuzz = None
+
+try:
+    import ahocorasick
+except ImportError:
+    # pyahocorasick is optional: without it book words are searched one by one
+    ahocorasick = None
+
 # ============================================================================
 # SPECIAL CASES: Manual duplicate mappings
 # ============================================================================
@@ -12,6 +30,12 @@ MANUAL_DUPLICATES = {
     'Son2025TTCT2C': 'nl.trung2022:book:TWR',  # incollection is a chapter of the book
 }
 
+# Format: ('key1', 'key2')
+# Both entries are kept even if they look like duplicates
+MANUAL_DISTINCT = {
+    ('DBLP:journals/access/NguyenSHNKTNHVD20', 'DBLP:journals/access/NguyenSHNKTNHVD20a'),  # Part I and Part II
+}
+
 # ============================================================================
 # FILTERING SETTINGS
 # ============================================================================
@@ -29,54 +53,218 @@ NOTE_REMOVE_PATTERNS = [
 ]
 
 # ============================================================================
+# DUPLICATE DETECTION SETTINGS
+# ============================================================================
+# Maximum year difference between two duplicates (preprint vs. published version)
+MAX_YEAR_GAP = 1
 
-def parse_bib_file(file_path):
-    """Parse a .bib file and extract all entries."""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
+# Minimum ratio between the shorter and longer normalized title
+MIN_TITLE_LENGTH_RATIO = 0.5
 
-    # Find all BibTeX entries
-    entries = []
-    # Match @type{key, ... } where content can span multiple lines
-    # Pattern captures everything up to the next @ or end of string
-    pattern = r'@(\w+)\s*\{\s*([^,\s]+)\s*,([^@]*?)(?=\n@|\Z)'
-    matches = re.finditer(pattern, content, re.DOTALL | re.MULTILINE)
+# Minimum title similarity, whatever the author and venue similarities
+MIN_TITLE_SIMILARITY = 0.6
+
+# ============================================================================
+# PARSING SETTINGS
+# ============================================================================
+# Below this total size of .bib files, worker process startup costs more than
+# it saves and files are parsed serially (parsing runs at roughly 10 MB/s)
+MIN_BYTES_FOR_PROCESSES = 4 * 1024 * 1024
 
-    for match in matches:
-        entry_type = match.group(1)
-        entry_key = match.group(2)
-        entry_body = match.group(3)
+# ============================================================================
+# COMPILED PATTERNS
+# ============================================================================
+# Entry type between '@' and the opening brace, e.g. 'article' in '@article{'
+ENTRY_TYPE_RE = re.compile(r'\s*(\w+)\s*')
+# Characters allowed between '@' and the opening brace
+ENTRY_TYPE_CHARS_RE = re.compile(r'[\w\s]*')
+BRACE_RE = re.compile(r'[{}]')
 
-        # entry_body already includes the closing }, just need to strip extra whitespace
-        # and ensure it ends with exactly one }
-        body_stripped = entry_body.rstrip()
-        if not body_stripped.endswith('}'):
-            body_stripped += '\n}'
+# Start of a field inside an entry body: name = value
+FIELD_NAME_RE = re.compile(r'(\w+)\s*=\s*')
 
-        # Reconstruct the full raw entry
-        raw_entry = f"@{entry_type}{{{entry_key},{body_stripped}\n"
+LATEX_CHARS_RE = re.compile(r'[\\{}]')
+WHITESPACE_RE = re.compile(r'\s+')
+WORD_RE = re.compile(r'\w+')
+
+NOTE_FIELD_RE = re.compile(r'^\s*note\s*=\s*[{"](.+)', re.IGNORECASE)
+NOTE_REMOVE_RE = re.compile('|'.join(f'(?:{p})' for p in NOTE_REMOVE_PATTERNS), re.IGNORECASE)
+
+# Entry types that hold no publication
+NON_ENTRY_TYPES = ['comment', 'string', 'preamble']
+
+# Parser states
+OUTSIDE = 0  # Between entries, looking for '@'
+IN_TYPE = 1  # After '@', reading the entry type up to '{'
+IN_BODY = 2  # Inside the braces of an entry, counting brace depth
+
+# ============================================================================
+
+def iter_bib_entries(file_path):
+    """Stream the entries of a .bib file, yielding (type, key, body) tuples.
+
+    The file is read line by line and entries are delimited by counting
+    braces, so nested braces in field values are handled and the whole
+    file is never held in memory. The body starts after the key and
+    includes the closing brace of the entry.
+    """
+    state = OUTSIDE
+    entry_type = ''
+    body_parts = []
+    brace_depth = 0
+
+    with open(file_path, 'r', encoding='utf-8', buffering=1 << 16) as f:
+        for line in f:
+            pos = 0
+            while pos < len(line):
+                if state == OUTSIDE:
+                    at = line.find('@', pos)
+                    if at < 0:
+                        break
+                    state = IN_TYPE
+                    entry_type = ''
+                    pos = at + 1
+
+                elif state == IN_TYPE:
+                    end = ENTRY_TYPE_CHARS_RE.match(line, pos).end()
+                    entry_type += line[pos:end]
+                    if end == len(line):
+                        break
+                    char = line[end]
+                    pos = end + 1
+                    type_match = ENTRY_TYPE_RE.fullmatch(entry_type)
+                    if char == '{' and type_match:
+                        entry_type = type_match.group(1)
+                        state = IN_BODY
+                        body_parts = []
+                        brace_depth = 1
+                    elif char == '@':
+                        # The previous '@' was stray, start over from this one
+                        entry_type = ''
+                    else:
+                        # A stray '@' (e.g. an email in a comment), not an entry
+                        state = OUTSIDE
+                        pos = end
+
+                else:  # IN_BODY
+                    if pos == 0 and line.startswith('@'):
+                        # An entry starting at column 0 while the previous one
+                        # is still open: the previous one is missing its closing
+                        # brace, close it here as the old regex parser did
+                        entry = close_unterminated_entry(file_path, entry_type, body_parts)
+                        if entry:
+                            yield entry
+                        state = OUTSIDE
+                        continue
+
+                    for brace in BRACE_RE.finditer(line, pos):
+                        brace_depth += 1 if brace.group() == '{' else -1
+                        if brace_depth == 0:
+                            break
+
+                    if brace_depth > 0:
+                        body_parts.append(line[pos:])
+                        break
+
+                    # Closing brace of the entry
+                    body_parts.append(line[pos:brace.end()])
+                    pos = brace.end()
+                    state = OUTSIDE
+
+                    key, comma, body = ''.join(body_parts).partition(',')
+                    if comma and entry_type.lower() not in NON_ENTRY_TYPES:
+                        yield entry_type, key.strip(), body
+
+    if state == IN_BODY:
+        # Unterminated last entry: keep it, closing it at the end of the file
+        entry = close_unterminated_entry(file_path, entry_type, body_parts)
+        if entry:
+            yield entry
+
+def close_unterminated_entry(file_path, entry_type, body_parts):
+    """Close an entry missing its closing brace, returning (type, key, body) or None."""
+    key, comma, body = ''.join(body_parts).partition(',')
+    if not comma or entry_type.lower() in NON_ENTRY_TYPES:
+        return None
+    print(f"Warning: entry {key.strip()} in {file_path} is not closed")
+    return entry_type, key.strip(), body.rstrip() + '\n}'
+
+def parse_field_value(body, pos):
+    """Parse a field value starting at pos, returning (value, end position)."""
+    if body.startswith('{', pos):
+        # Braced value: everything up to the matching closing brace
+        depth = 0
+        for brace in BRACE_RE.finditer(body, pos):
+            depth += 1 if brace.group() == '{' else -1
+            if depth == 0:
+                return body[pos + 1:brace.start()], brace.end()
+        return body[pos + 1:], len(body)
+
+    if body.startswith('"', pos):
+        # Quoted value: up to the next quote outside of braces
+        depth = 0
+        for i in range(pos + 1, len(body)):
+            char = body[i]
+            if char == '{':
+                depth += 1
+            elif char == '}':
+                depth -= 1
+            elif char == '"' and depth == 0:
+                return body[pos + 1:i], i + 1
+        return body[pos + 1:], len(body)
+
+    # Bare value (number, month macro or concatenation): up to the next
+    # comma outside of braces, or the closing brace of the entry
+    depth = 0
+    for i in range(pos, len(body)):
+        char = body[i]
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            if depth == 0:
+                return body[pos:i].strip(), i
+            depth -= 1
+        elif char == ',' and depth == 0:
+            return body[pos:i].strip(), i
+    return body[pos:].strip(), len(body)
+
+def parse_fields(body):
+    """Parse all fields of an entry body into a dict of lowercase names to values."""
+    fields = {}
+    pos = 0
+    while True:
+        field_match = FIELD_NAME_RE.search(body, pos)
+        if not field_match:
+            break
+        field_value, pos = parse_field_value(body, field_match.end())
+        fields[field_match.group(1).lower()] = field_value
+    return fields
+
+def parse_bib_file(file_path):
+    """Parse a .bib file and extract all entries."""
+    entries = []
+
+    for entry_type, entry_key, entry_body in iter_bib_entries(file_path):
+        # Reconstruct the full raw entry, ending with the closing }
+        raw_entry = f"@{entry_type}{{{entry_key},{entry_body.rstrip()}\n"
 
         # Parse fields (for comparison purposes)
-        fields = {}
-        # More robust field pattern that handles multi-line values
-        field_pattern = r'(\w+)\s*=\s*\{((?:[^{}]|\{[^{}]*\})*)\}|(\w+)\s*=\s*"([^"]*)"'
-        field_matches = re.finditer(field_pattern, entry_body, re.DOTALL)
-
-        for field_match in field_matches:
-            if field_match.group(1):
-                field_name = field_match.group(1).lower()
-                field_value = field_match.group(2)
-            else:
-                field_name = field_match.group(3).lower()
-                field_value = field_match.group(4)
-            fields[field_name] = field_value
+        fields = parse_fields(entry_body)
 
-        entries.append({
+        entry = {
             'type': entry_type,
             'key': entry_key,
             'fields': fields,
             'raw': raw_entry  # Keep original raw entry
-        })
+        }
+
+        # Normalize compared fields once here instead of in every comparison
+        entry['_type_lc'] = entry_type.lower()
+        entry['_nauthor'] = normalize_text(fields.get('author', ''))
+        entry['_ntitle'] = normalize_text(fields.get('title', ''))
+        entry['_nvenue'] = normalize_text(get_venue_field(entry))
+
+        entries.append(entry)
 
     return entries
 
@@ -85,10 +273,15 @@ def normalize_text(text):
     if not text:
         return ""
     # Remove special LaTeX characters and normalize
-    text = re.sub(r'[\\{}]', '', text)
-    text = re.sub(r'\s+', ' ', text)
+    text = LATEX_CHARS_RE.sub('', text)
+    text = WHITESPACE_RE.sub(' ', text)
     return text.lower().strip()
 
+@lru_cache(maxsize=None)
+def compile_fields_re(fields):
+    """Compile (once per tuple of fields) a pattern matching a line that starts one of the fields."""
+    return re.compile(rf'^\s*(?:{"|".join(map(re.escape, fields))})\s*=', re.IGNORECASE)
+
 def remove_fields_from_entry(raw_entry, fields_to_remove):
     """Remove specified fields from a raw BibTeX entry string."""
     lines = raw_entry.split('\n')
@@ -96,21 +289,18 @@ def remove_fields_from_entry(raw_entry, fields_to_remove):
     skip_line = False
     current_field_value = []
     current_field_name = None
+    # Match any of the fields at the start of the line (with optional whitespace)
+    remove_re = compile_fields_re(tuple(fields_to_remove))
 
     for i, line in enumerate(lines):
         # Check if this line starts a field that should be removed
         line_stripped = line.strip()
-        should_skip = False
 
         # Check for regular fields to remove
-        for field in fields_to_remove:
-            # Match field at the start of the line (with optional whitespace)
-            if re.match(rf'^\s*{field}\s*=', line, re.IGNORECASE):
-                should_skip = True
-                break
+        should_skip = bool(fields_to_remove and remove_re.match(line))
 
         # Special handling for 'note' field - check if it contains query patterns
-        note_match = re.match(r'^\s*note\s*=\s*[{"](.+)', line, re.IGNORECASE)
+        note_match = NOTE_FIELD_RE.match(line)
         if note_match and not should_skip:
             # Start capturing the note value
             current_field_name = 'note'
@@ -184,20 +374,44 @@ def remove_fields_from_entry(raw_entry, fields_to_remove):
 
 def should_remove_note(note_content):
     """Check if a note field contains query metadata that should be removed."""
-    for pattern in NOTE_REMOVE_PATTERNS:
-        if re.search(pattern, note_content, re.IGNORECASE):
-            return True
-    return False
+    return bool(NOTE_REMOVE_RE.search(note_content))
+
+def calculate_similarity(str1, str2, min_similarity=0.0):
+    """Calculate similarity ratio between two normalized strings.
 
-def calculate_similarity(str1, str2):
-    """Calculate similarity ratio between two strings."""
+    Ratios below min_similarity are not exact: they are only guaranteed to
+    be below min_similarity, which is enough to reject a candidate.
+    """
     if not str1 or not str2:
         return 0.0
-    return SequenceMatcher(None, normalize_text(str1), normalize_text(str2)).ratio()
+    # Normalized fields are interned, so identical strings are usually the same object
+    if str1 is str2 or str1 == str2:
+        return 1.0
+
+    if fuzz is not None and min_similarity > 0:
+        # Indel ratio (computed in C) is never lower than the SequenceMatcher ratio,
+        # and score_cutoff lets rapidfuzz stop early (returning 0) below the cutoff
+        upper_bound = fuzz.ratio(str1, str2, score_cutoff=min_similarity * 100) / 100.0
+        if upper_bound < min_similarity:
+            return upper_bound
+
+    # autojunk only kicks in above 200 characters (long author lists, venues)
+    # where it silently skews the ratio
+    matcher = SequenceMatcher(None, str1, str2, autojunk=False)
+    if min_similarity > 0:
+        # Cheap upper bounds of ratio(), from lengths then character counts
+        upper_bound = matcher.real_quick_ratio()
+        if upper_bound < min_similarity:
+            return upper_bound
+        upper_bound = matcher.quick_ratio()
+        if upper_bound < min_similarity:
+            return upper_bound
+
+    return matcher.ratio()
 
 def get_venue_field(entry):
     """Get the appropriate venue field based on entry type."""
-    entry_type = entry['type'].lower()
+    entry_type = entry['_type_lc']
     fields = entry['fields']
 
     # Map entry types to their venue fields
@@ -219,15 +433,31 @@ def get_venue_field(entry):
         # Default: try journal, booktitle, or publisher
         return fields.get('journal', '') or fields.get('booktitle', '') or fields.get('publisher', '')
 
+def get_book_words(book):
+    """Get the significant words (longer than 3 chars) of a book title.
+
+    The words, and their Aho-Corasick automaton when pyahocorasick is
+    available, are cached on the book entry for later comparisons.
+    """
+    if '_book_words' not in book:
+        book['_book_words'] = [w for w in book['_ntitle'].split() if len(w) > 3]
+        if ahocorasick is not None and book['_book_words']:
+            automaton = ahocorasick.Automaton()
+            for word in book['_book_words']:
+                automaton.add_word(word, word)
+            automaton.make_automaton()
+            book['_book_automaton'] = automaton
+    return book['_book_words']
+
 def is_incollection_of_book(incollection, book):
     """Check if an incollection entry is a chapter of a book entry."""
-    if incollection['type'].lower() != 'incollection' or book['type'].lower() != 'book':
+    if incollection['_type_lc'] != 'incollection' or book['_type_lc'] != 'book':
         return False
 
     # Check if they have similar authors and same year
     author_sim = calculate_similarity(
-        incollection['fields'].get('author', ''),
-        book['fields'].get('author', '') or book['fields'].get('editor', '')
+        incollection['_nauthor'],
+        book['_nauthor'] or normalize_text(book['fields'].get('editor', ''))
     )
 
     incollection_year = incollection['fields'].get('year', '')
@@ -241,16 +471,22 @@ def is_incollection_of_book(incollection, book):
     # Check if the booktitle of incollection contains keywords from book title
     # This works even if one is in English and one is in Vietnamese
     incollection_booktitle = normalize_text(incollection['fields'].get('booktitle', ''))
-    book_title = normalize_text(book['fields'].get('title', ''))
+    book_title = book['_ntitle']
 
     if not incollection_booktitle or not book_title:
         return False
 
     # Extract significant words (longer than 3 chars) from book title
-    book_words = [w for w in book_title.split() if len(w) > 3]
+    book_words = get_book_words(book)
 
     # Check if at least 2 significant words from book title appear in incollection booktitle
-    matching_words = sum(1 for word in book_words if word in incollection_booktitle)
+    automaton = book.get('_book_automaton')
+    if automaton is not None:
+        # Single scan for all words; a word counts once however often it appears
+        found_words = {word for _, word in automaton.iter(incollection_booktitle)}
+        matching_words = sum(1 for word in book_words if word in found_words)
+    else:
+        matching_words = sum(1 for word in book_words if word in incollection_booktitle)
 
     if len(book_words) > 0 and matching_words >= min(2, len(book_words)):
         return True
@@ -262,47 +498,88 @@ def is_incollection_of_book(incollection, book):
 def are_entries_duplicate(entry1, entry2, threshold=0.7):
     """Check if two entries are duplicates based on author, journal/booktitle, and title."""
 
+    # Special case: entries manually marked as distinct publications
+    if ((entry1['key'], entry2['key']) in MANUAL_DISTINCT or
+            (entry2['key'], entry1['key']) in MANUAL_DISTINCT):
+        return False
+
     # Special case: book and incollection relationship
     # If incollection is a chapter of book, consider incollection as duplicate (keep book only)
-    if (entry1['type'].lower() == 'book' and entry2['type'].lower() == 'incollection'):
+    if (entry1['_type_lc'] == 'book' and entry2['_type_lc'] == 'incollection'):
         if is_incollection_of_book(entry2, entry1):
             return True  # incollection is duplicate of book
-    elif (entry1['type'].lower() == 'incollection' and entry2['type'].lower() == 'book'):
+    elif (entry1['_type_lc'] == 'incollection' and entry2['_type_lc'] == 'book'):
         if is_incollection_of_book(entry1, entry2):
             return True  # incollection is duplicate of book
 
-    # Get venue using appropriate field for each entry type
-    venue1 = get_venue_field(entry1)
-    venue2 = get_venue_field(entry2)
+    # Cheap gates before any fuzzy matching
+    # Entries published years apart are not the same publication
+    try:
+        year1 = int(entry1['fields'].get('year', ''))
+        year2 = int(entry2['fields'].get('year', ''))
+        if abs(year1 - year2) > MAX_YEAR_GAP:
+            return False
+    except ValueError:
+        pass
+
+    # Titles of very different lengths cannot be similar
+    title1 = entry1['_ntitle']
+    title2 = entry2['_ntitle']
+    if not title1 or not title2:
+        return False
+    if min(len(title1), len(title2)) / max(len(title1), len(title2)) < MIN_TITLE_LENGTH_RATIO:
+        return False
+
+    # Calculate title similarity first: different titles are different
+    # publications, however similar the authors and venue are
+    title_sim = calculate_similarity(title1, title2, MIN_TITLE_SIMILARITY)
+    if title_sim < MIN_TITLE_SIMILARITY:
+        return False
 
-    # Calculate similarities
+    # Even a perfect venue similarity cannot bring the average above the threshold
     author_sim = calculate_similarity(
-        entry1['fields'].get('author', ''),
-        entry2['fields'].get('author', '')
+        entry1['_nauthor'],
+        entry2['_nauthor'],
+        3 * threshold - title_sim - 1.0
     )
+    if (title_sim + author_sim + 1.0) / 3 < threshold:
+        return False
 
-    title_sim = calculate_similarity(
-        entry1['fields'].get('title', ''),
-        entry2['fields'].get('title', '')
+    # Venue was taken from the appropriate field for each entry type at parse time
+    venue_sim = calculate_similarity(
+        entry1['_nvenue'],
+        entry2['_nvenue'],
+        3 * threshold - title_sim - author_sim
     )
 
-    venue_sim = calculate_similarity(venue1, venue2)
-
     # Average similarity across all three fields
     avg_similarity = (author_sim + title_sim + venue_sim) / 3
 
     return avg_similarity >= threshold
 
-def merge_bib_files(bibs_dir, output_file, similarity_threshold=0.7):
-    """Merge all .bib files from bibs_dir, removing duplicates."""
+def get_blocking_tokens(entry):
+    """Get the significant title words used to block candidate duplicates."""
+    # Same notion of significant word as is_incollection_of_book (longer than 3 chars),
+    # ignoring punctuation so that 'theory.' and 'theory' match
+    return {w for w in WORD_RE.findall(entry['_ntitle']) if len(w) > 3}
+
+def merge_bib_files(bibs_dir, output_file, similarity_threshold=0.7, verbose=False):
+    """Merge all .bib files from bibs_dir, removing duplicates.
+
+    Per-entry decisions (filtered entries, duplicates) are collected and
+    printed in one go at the end, only when verbose is set.
+    """
     bibs_path = Path(bibs_dir)
 
     if not bibs_path.exists():
         print(f"Error: Directory {bibs_dir} does not exist")
         return
 
-    # Collect all .bib files
-    bib_files = sorted(bibs_path.glob('*.bib'))
+    # Collect all .bib files (plain path strings, cheap to send to worker processes)
+    with os.scandir(bibs_path) as dir_entries:
+        bib_entries = [e for e in dir_entries if e.name.endswith('.bib') and e.is_file()]
+    bib_files = sorted(e.path for e in bib_entries)
+    total_size = sum(e.stat().st_size for e in bib_entries)
 
     if not bib_files:
         print(f"No .bib files found in {bibs_dir}")
@@ -310,21 +587,36 @@ def merge_bib_files(bibs_dir, output_file, similarity_threshold=0.7):
 
     print(f"Found {len(bib_files)} .bib files")
 
-    # Collect all entries first
-    all_entries = []
+    # Per-file and per-entry messages, only collected (and printed at the end) in verbose mode
+    log_lines = []
+
+    def log(message):
+        if verbose:
+            log_lines.append(message)
 
-    # Process each file
     for bib_file in bib_files:
-        print(f"Processing {bib_file.name}...")
-        entries = parse_bib_file(bib_file)
-        all_entries.extend(entries)
+        log(f"Processing {os.path.basename(bib_file)}...")
+
+    # Collect all entries first, parsing large inputs in parallel (map keeps file order)
+    if total_size >= MIN_BYTES_FOR_PROCESSES:
+        with ProcessPoolExecutor() as executor:
+            all_entries = list(chain.from_iterable(executor.map(parse_bib_file, bib_files)))
+    else:
+        all_entries = list(chain.from_iterable(map(parse_bib_file, bib_files)))
+
+    # Intern normalized fields so identical strings (same venue, same title
+    # across files) share one object. Done here because interning is lost
+    # when entries are pickled back from worker processes
+    for entry in all_entries:
+        for field in ('_nauthor', '_ntitle', '_nvenue'):
+            entry[field] = sys.intern(entry[field])
 
     total_count = len(all_entries)
 
     # Sort entries: prioritize @book over @incollection for same publications
     # This ensures that when we detect book-incollection relationship, we keep the book
     def entry_priority(entry):
-        entry_type = entry['type'].lower()
+        entry_type = entry['_type_lc']
         if entry_type == 'book':
             return 0  # Highest priority
         elif entry_type == 'incollection':
@@ -336,6 +628,18 @@ def merge_bib_files(bibs_dir, output_file, similarity_threshold=0.7):
 
     # Now deduplicate
     unique_entries = []
+    # Blocking index: (year, significant title word) -> indices into unique_entries
+    # Only entries within MAX_YEAR_GAP years sharing at least one title word
+    # are scored as candidates
+    block_index = defaultdict(list)
+    # Books are always candidates for incollections (chapters have their own
+    # title and may be dated differently from the book)
+    book_indices = []
+    # Year bucket: year -> indices into unique_entries. Entries without any
+    # significant title word cannot be found through the blocking index:
+    # they scan, and are candidates for, every entry within MAX_YEAR_GAP years
+    unique_by_year = defaultdict(list)
+    no_token_by_year = defaultdict(list)
     duplicate_count = 0
     filtered_count = 0
     filtered_incomplete = 0
@@ -346,11 +650,11 @@ def merge_bib_files(bibs_dir, output_file, similarity_threshold=0.7):
         year_str = entry['fields'].get('year', '')
         if not year_str:
             filtered_no_year += 1
-            print(f"  Filtered (no year): {entry['key']}")
+            log(f"  Filtered (no year): {entry['key']}")
             continue
 
         # Filter incomplete @misc entries (no useful publication info)
-        if entry['type'].lower() == 'misc':
+        if entry['_type_lc'] == 'misc':
             has_venue = bool(entry['fields'].get('journal') or
                            entry['fields'].get('booktitle') or
                            entry['fields'].get('publisher') or
@@ -363,7 +667,7 @@ def merge_bib_files(bibs_dir, output_file, similarity_threshold=0.7):
                 # Check if it only has author, title, citation, note
                 if 'citation' in entry['fields'] or 'note' in entry['fields']:
                     filtered_incomplete += 1
-                    print(f"  Filtered (incomplete @misc): {entry['key']}")
+                    log(f"  Filtered (incomplete @misc): {entry['key']}")
                     continue
 
         # Filter by year
@@ -371,47 +675,81 @@ def merge_bib_files(bibs_dir, output_file, similarity_threshold=0.7):
             year = int(year_str)
             if year < MIN_YEAR:
                 filtered_count += 1
-                print(f"  Filtered (year {year}): {entry['key']}")
+                log(f"  Filtered (year {year}): {entry['key']}")
                 continue
         except ValueError:
             # If year is not a valid integer, filter it out
             filtered_no_year += 1
-            print(f"  Filtered (invalid year '{year_str}'): {entry['key']}")
+            log(f"  Filtered (invalid year '{year_str}'): {entry['key']}")
             continue
 
         # Check manual duplicates first
         if entry['key'] in MANUAL_DUPLICATES:
             duplicate_count += 1
-            print(f"  Manual duplicate: {entry['key']} ~ {MANUAL_DUPLICATES[entry['key']]}")
+            log(f"  Manual duplicate: {entry['key']} ~ {MANUAL_DUPLICATES[entry['key']]}")
             continue
 
         # Check if this entry is a duplicate
         is_duplicate = False
+        tokens = get_blocking_tokens(entry)
+        candidates = set()
+        for candidate_year in range(year - MAX_YEAR_GAP, year + MAX_YEAR_GAP + 1):
+            if tokens:
+                for token in tokens:
+                    candidates.update(block_index.get((candidate_year, token), ()))
+                candidates.update(no_token_by_year.get(candidate_year, ()))
+            else:
+                candidates.update(unique_by_year.get(candidate_year, ()))
+        if entry['_type_lc'] == 'incollection':
+            candidates.update(book_indices)
 
-        for unique_entry in unique_entries:
+        # Visit candidates in insertion order, as the full scan did
+        for idx in sorted(candidates):
+            unique_entry = unique_entries[idx]
             if are_entries_duplicate(entry, unique_entry, similarity_threshold):
                 is_duplicate = True
                 duplicate_count += 1
-                print(f"  Duplicate found: {entry['key']} ~ {unique_entry['key']}")
+                log(f"  Duplicate found: {entry['key']} ~ {unique_entry['key']}")
                 break
 
         if not is_duplicate:
-            unique_entries.append(entry)    # Write merged output
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write("% Merged AVITECH Publications\n")
-        f.write(f"% Total entries: {len(unique_entries)}\n")
-        f.write(f"% Duplicates removed: {duplicate_count}\n")
-        f.write(f"% Filtered by year (< {MIN_YEAR}): {filtered_count}\n")
-        f.write(f"% Filtered incomplete @misc: {filtered_incomplete}\n")
-        f.write(f"% Filtered no/invalid year: {filtered_no_year}\n")
-        f.write(f"% Original total: {total_count}\n")
-        f.write(f"% Removed fields: {', '.join(FIELDS_TO_REMOVE)}\n\n")
-
-        for entry in unique_entries:
-            # Remove unwanted fields from the raw entry
-            cleaned_entry = remove_fields_from_entry(entry['raw'], FIELDS_TO_REMOVE)
-            f.write(cleaned_entry)
-            f.write('\n\n')
+            for token in tokens:
+                block_index[(year, token)].append(len(unique_entries))
+            if not tokens:
+                no_token_by_year[year].append(len(unique_entries))
+            unique_by_year[year].append(len(unique_entries))
+            if entry['_type_lc'] == 'book':
+                book_indices.append(len(unique_entries))
+            unique_entries.append(entry)
+
+    # Write merged output next to the output file, then move it in place,
+    # so an interrupted run never leaves a half-written output file
+    tmp_output_file = f"{output_file}.tmp"
+    try:
+        with open(tmp_output_file, 'w', encoding='utf-8') as f:
+            f.write("% Merged AVITECH Publications\n")
+            f.write(f"% Total entries: {len(unique_entries)}\n")
+            f.write(f"% Duplicates removed: {duplicate_count}\n")
+            f.write(f"% Filtered by year (< {MIN_YEAR}): {filtered_count}\n")
+            f.write(f"% Filtered incomplete @misc: {filtered_incomplete}\n")
+            f.write(f"% Filtered no/invalid year: {filtered_no_year}\n")
+            f.write(f"% Original total: {total_count}\n")
+            f.write(f"% Removed fields: {', '.join(FIELDS_TO_REMOVE)}\n\n")
+
+            for entry in unique_entries:
+                # Remove unwanted fields from the raw entry
+                cleaned_entry = remove_fields_from_entry(entry['raw'], FIELDS_TO_REMOVE)
+                f.write(cleaned_entry)
+                f.write('\n\n')
+
+        os.replace(tmp_output_file, output_file)
+    except BaseException:
+        if os.path.exists(tmp_output_file):
+            os.remove(tmp_output_file)
+        raise
+
+    if log_lines:
+        print('\n'.join(log_lines))
 
     print(f"\nMerge complete!")
     print(f"Total entries processed: {total_count}")
@@ -423,6 +761,11 @@ def merge_bib_files(bibs_dir, output_file, similarity_threshold=0.7):
     print(f"Output written to: {output_file}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge the member .bib files into AVITECH.bib")
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help="list every filtered entry and duplicate found")
+    args = parser.parse_args()
+
     # Get the script directory
     script_dir = Path(__file__).parent
 
@@ -433,4 +776,4 @@ if __name__ == "__main__":
     output_file = script_dir / "AVITECH.bib"  # Output in same directory as script
 
     # Run the merge with 70% similarity threshold
-    merge_bib_files(bibs_directory, output_file, similarity_threshold=0.7)
+    merge_bib_files(bibs_directory, output_file, similarity_threshold=0.7, verbose=args.verbose)
@@ -0,0 +1,141 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from merge import are_entries_duplicate, iter_bib_entries, merge_bib_files, parse_bib_file, parse_fields
+
+
+class IterBibEntriesTest(unittest.TestCase):
+    def parse_keys(self, content):
+        with tempfile.NamedTemporaryFile('w', suffix='.bib', encoding='utf-8', delete=False) as f:
+            f.write(content)
+        try:
+            return [key for _, key, _ in iter_bib_entries(f.name)]
+        finally:
+            os.remove(f.name)
+
+    def test_stray_at_before_entry(self):
+        content = (
+            "% Maintainer: someone@example.org\n"
+            "@article{key1,\n  title = {First},\n}\n"
+            "@article{key2,\n  title = {Second},\n}\n"
+        )
+        self.assertEqual(self.parse_keys(content), ['key1', 'key2'])
+
+    def test_stray_at_on_same_line(self):
+        content = "mail a@b @article{key1,\n  title = {First},\n}\n"
+        self.assertEqual(self.parse_keys(content), ['key1'])
+
+    def test_unterminated_last_entry(self):
+        content = (
+            "@article{key1,\n  title = {First},\n}\n"
+            "@article{key2,\n  title = {Second},\n"
+        )
+        self.assertEqual(self.parse_keys(content), ['key1', 'key2'])
+
+    def test_unterminated_entry_mid_file(self):
+        content = (
+            "@article{key1,\n  title = {First paper},\n"
+            "@article{key2,\n  title = {Second paper},\n}\n"
+            "@article{key3,\n  title = {Third paper on graphs},\n}\n"
+        )
+        with tempfile.NamedTemporaryFile('w', suffix='.bib', encoding='utf-8', delete=False) as f:
+            f.write(content)
+        try:
+            entries = parse_bib_file(f.name)
+        finally:
+            os.remove(f.name)
+        self.assertEqual([e['key'] for e in entries], ['key1', 'key2', 'key3'])
+        self.assertEqual(entries[0]['fields']['title'], 'First paper')
+        self.assertTrue(entries[0]['raw'].rstrip().endswith('}'))
+        self.assertNotIn('key2', entries[0]['raw'])
+
+    def test_at_inside_field_value(self):
+        content = (
+            "@misc{key1,\n  note = {Contact: someone@example.org},\n}\n"
+            "@article{key2,\n  title = {Second},\n}\n"
+        )
+        self.assertEqual(self.parse_keys(content), ['key1', 'key2'])
+
+    def test_skips_comment_and_string(self):
+        content = (
+            "@Comment{jabref-meta: databaseType:bibtex;}\n"
+            "@string{ieee = {IEEE}}\n"
+            "@article{key1,\n  title = {First},\n}\n"
+            "@comment{x, y}\n"
+        )
+        self.assertEqual(self.parse_keys(content), ['key1'])
+
+
+class ParseFieldsTest(unittest.TestCase):
+    def test_nested_braces(self):
+        fields = parse_fields(
+            "\n  title = {{{AutoEncoder-based}} Feature Ranking for {{PET}} Image},\n"
+            "  author = {Bj{\\\"{o}}rn E. Ottersten and Nguyen Linh Trung},\n"
+        )
+        self.assertEqual(fields['title'], '{{AutoEncoder-based}} Feature Ranking for {{PET}} Image')
+        self.assertEqual(fields['author'], 'Bj{\\\"{o}}rn E. Ottersten and Nguyen Linh Trung')
+
+    def test_quoted_value_with_braces(self):
+        fields = parse_fields('\n  title = "A {"}quoted{"} {Title}",\n  year = "2021"\n')
+        self.assertEqual(fields['title'], 'A {"}quoted{"} {Title}')
+        self.assertEqual(fields['year'], '2021')
+
+    def test_bare_values(self):
+        fields = parse_fields("\n  month = jan,\n  year = 2020,\n  pages = jan #{--} # jun\n")
+        self.assertEqual(fields['month'], 'jan')
+        self.assertEqual(fields['year'], '2020')
+        self.assertEqual(fields['pages'], 'jan #{--} # jun')
+
+    def test_last_bare_value_before_closing_brace(self):
+        fields = parse_fields("\n  year = 2020}")
+        self.assertEqual(fields['year'], '2020')
+
+    def test_field_names_lowercased(self):
+        fields = parse_fields("\n  TITLE = {Upper},\n  BookTitle={Mixed}\n")
+        self.assertEqual(fields, {'title': 'Upper', 'booktitle': 'Mixed'})
+
+
+class BlockingTest(unittest.TestCase):
+    """The blocking index must not change which entries are kept."""
+
+    ENTRIES = [
+        ('a1', 'DoA in 5G', '2022'),
+        ('a2', 'DoA in 5G.', '2022'),
+        ('b1', 'Two-way relay theory.', '2021'),
+        ('b2', 'Two-way relay theory', '2021'),
+        ('c1', 'IoT in 5G', '2020'),
+        ('c2', 'IoTs in 5G', '2021'),
+        ('d1', 'Graph signal processing', '2019'),
+        ('d2', 'Graph signal processing', '2023'),
+    ]
+
+    def write_bib(self, bibs_dir):
+        with open(os.path.join(bibs_dir, 'member.bib'), 'w', encoding='utf-8') as f:
+            for key, title, year in self.ENTRIES:
+                f.write(f"@article{{{key},\n  author = {{Nguyen Van A and Tran Thi B}},\n"
+                        f"  title = {{{title}}},\n  journal = {{IEEE Access}},\n  year = {{{year}}},\n}}\n\n")
+
+    def test_blocked_matches_full_scan(self):
+        with tempfile.TemporaryDirectory() as bibs_dir:
+            self.write_bib(bibs_dir)
+            output_file = os.path.join(bibs_dir, 'merged.out')
+            with contextlib.redirect_stdout(io.StringIO()):
+                merge_bib_files(bibs_dir, output_file)
+            blocked = [key for _, key, _ in iter_bib_entries(output_file)]
+
+            unique_entries = []
+            for entry in parse_bib_file(os.path.join(bibs_dir, 'member.bib')):
+                if not any(are_entries_duplicate(entry, u) for u in unique_entries):
+                    unique_entries.append(entry)
+            full_scan = [entry['key'] for entry in unique_entries]
+
+        self.assertEqual(blocked, full_scan)
+        self.assertNotIn('a2', blocked)
+        self.assertNotIn('b2', blocked)
+
+
+if __name__ == "__main__":
+    unittest.main()